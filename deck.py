@@ -4,8 +4,10 @@ Author: William Ughetta
 Implements a standard 52 deck of playing cards and Knuth Shuffle.
 """
 
+import os
 from enum import Enum
 from random import randint
+from weakref import WeakSet
 
 class Deck:
     """
@@ -18,7 +20,21 @@ class Deck:
     # of the pointers is the order of the deck. The right side is the top.
     cards = []
 
-    def __init__(self):
+    def __init__(self, secure=False, rng=None):
+        """
+        Set secure to True to shuffle with the operating system's
+        cryptographically secure random source instead of `random`.
+        Otherwise an optional random.Random instance may be given as rng
+        so that shuffles are reproducible from its state.
+        """
+        assert not (secure and rng is not None)
+        self.entropy = EntropyPool() if secure else None
+        if secure:
+            self.randint = self.entropy.randint
+        elif rng is not None:
+            self.randint = rng.randint
+        else:
+            self.randint = randint
         self.shuffle()
 
     def shuffle(self):
@@ -26,7 +42,7 @@ class Deck:
         Restores the deck to 52 cards and shuffles the positions.
         """
         self.cards = [index for index in range(N_CARDS)]
-        knuth_shuffle(self.cards)
+        knuth_shuffle(self.cards, self.randint)
 
     def pop(self):
         """
@@ -45,12 +61,13 @@ class Deck:
         else:
             return self.pop()
 
-def knuth_shuffle(array):
+def knuth_shuffle(array, randint=randint):
     """
     Randomly shuffles an array in linear time using Knuth's algorithm.
     Algorithm: Traverse array and randomly pick the current index or one
     to the left of it. Then swap the current index and the random one.
     Method from Princeton COS 226 Algorithms and Data Structures.
+    The optional randint(a, b) must return a uniform integer in [a, b].
     """
     for i in range(len(array)):
         random = randint(0, i)
@@ -58,6 +75,100 @@ def knuth_shuffle(array):
         array[random] = array[i]
         array[i] = swp
 
+class EntropyPool:
+    """
+    Draws unbiased random integers from os.urandom. Bytes are read in
+    large blocks and buffered so that shuffling a whole deck only costs
+    a syscall every few dozen shuffles instead of one per swap.
+    """
+
+    # Number of bytes read from the operating system per refill
+    BLOCK_SIZE = 4096
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        assert block_size > 0
+        self.block_size = block_size
+        self.buffer = b''
+        self.position = 0
+        _ENTROPY_POOLS.add(self)
+
+    def clear(self):
+        """
+        Drops any buffered entropy. Called in a forked child so it never
+        reuses the bytes its parent (and siblings) will also use.
+        """
+        self.buffer = b''
+        self.position = 0
+
+    def refill(self, n_bytes):
+        """
+        Reads a new block from the operating system so at least n_bytes are
+        buffered. This is the only place bytes are taken from the operating
+        system. The unread tail is kept so no entropy is thrown away.
+        """
+        self.buffer = self.buffer[self.position:] + os.urandom(max(self.block_size, n_bytes))
+        self.position = 0
+
+    def read(self, n_bytes):
+        """
+        Returns the next n_bytes of buffered entropy, refilling lazily.
+        """
+        if self.position + n_bytes > len(self.buffer):
+            self.refill(n_bytes)
+        start = self.position
+        self.position += n_bytes
+        return self.buffer[start:self.position]
+
+    def randint(self, a, b):
+        """
+        Returns a uniform random integer in [a, b] inclusive. Uses rejection
+        sampling: draws falling in the incomplete final block of size n are
+        discarded, so taking the remainder mod n is free of modulo bias.
+        """
+        assert a <= b
+        n = b - a + 1
+        if n <= 256:
+            # Same as read(1) without slicing; needed to keep up with randint
+            limit = 256 - 256 % n
+            while True:
+                if self.position >= len(self.buffer):
+                    self.refill(1)
+                draw = self.buffer[self.position]
+                self.position += 1
+                if draw < limit:
+                    return a + draw % n
+        if n <= 65536:
+            # Same as read(2) without slicing, so shoes of more than 256
+            # cards (e.g. an 8 deck shoe of 416) also keep up with randint
+            limit = 65536 - 65536 % n
+            while True:
+                position = self.position
+                if position + 2 > len(self.buffer):
+                    self.refill(2)
+                    position = 0
+                buffer = self.buffer
+                draw = buffer[position] << 8 | buffer[position + 1]
+                self.position = position + 2
+                if draw < limit:
+                    return a + draw % n
+        n_bytes = ((n - 1).bit_length() + 7) // 8
+        space = 1 << (8 * n_bytes)
+        limit = space - (space % n)
+        while True:
+            draw = int.from_bytes(self.read(n_bytes), 'big')
+            if draw < limit:
+                return a + draw % n
+
+def _clear_entropy_pools():
+    """ Clears every live EntropyPool, run in the child after fork() """
+    for pool in list(_ENTROPY_POOLS):
+        pool.clear()
+
+# Every EntropyPool, tracked weakly so they can be cleared after fork()
+_ENTROPY_POOLS = WeakSet()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_clear_entropy_pools)
+
 class Card:
     """ Represents one card for example the Two of Hearts """
     def __init__(self, value, suite):
@@ -4,8 +4,6 @@ Author: William Ughetta
 Backend model for a Blackjack game. Separates business logic from frontend
 """
 
-from random import randint
-
 from deck import Deck
 from player import Player
 
@@ -21,10 +19,11 @@ class Game:
         'Foxtrot', 'Golf', 'Hotel', 'India', 'Juliett'
     ]
 
-    def __init__(self, n_players, human_name='You'):
+    def __init__(self, n_players, human_name='You', rng=None):
         """
         Initializes all players. Takes number of players excluding the
-        Dealer and the Human
+        Dealer and the Human. An optional random.Random instance rng makes
+        seating and shuffling reproducible.
         """
 
         # Set number of players
@@ -33,7 +32,7 @@ class Game:
         else:
             self.n_players = n_players
 
-        self.deck = Deck()
+        self.deck = Deck(rng=rng)
 
         # Initialize number of players
         self.players = [Player(human_name, is_computer=False),]
@@ -41,7 +40,7 @@ class Game:
             self.players.append(Player(self.COMPUTER_NAMES[i]))
 
         # Insert self into random order with the players
-        random = randint(0, self.n_players)
+        random = self.deck.randint(0, self.n_players)
         tmp = self.players[0]
         self.players[0] = self.players[random]
         self.players[random] = tmp
@@ -0,0 +1,196 @@
+"""
+simulation.py
+Author: William Ughetta
+Runs long automated Blackjack simulations that periodically checkpoint to
+disk and can be resumed with the same final results as an unbroken run.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from random import Random
+
+from game import Game
+
+class Simulation:
+    """
+    Plays many rounds of a Game where every seat, including the human one,
+    follows the computer rule. Tracks per-seat counters and can save and
+    restore its complete state (RNG, round count, counters, seats, shoe).
+    Each round a seat counts one of wins, losses or pushes (a tie with a
+    dealer who did not bust); busts are also counted within losses.
+    """
+
+    # Format version of the checkpoint file
+    CHECKPOINT_VERSION = 2
+
+    # Rounds played between checkpoints. A checkpoint costs about a
+    # millisecond, so this keeps the amortized cost per round tiny.
+    CHECKPOINT_EVERY = 1000
+
+    def __init__(self, n_players, seed=None, checkpoint_path=None,
+                 checkpoint_every=CHECKPOINT_EVERY):
+        assert checkpoint_every > 0
+        self.n_players = n_players
+        self.seed = seed
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.rng = Random(seed)
+        self.game = Game(n_players, rng=self.rng)
+        self.rounds = 0
+        self.counters = {player.name: {'wins': 0, 'losses': 0, 'pushes': 0, 'busts': 0}
+                         for player in self.game.players[:-1]}
+        self.dealer_busts = 0
+
+    def play_round(self):
+        """
+        Deals and plays one full round, then updates the counters.
+        """
+        game = self.game
+        game.deal()
+        while game.can_play():
+            if game.is_current_player_a_computer():
+                game.play_computer_turn()
+            else:
+                # The human seat plays by the same rule as the computers
+                while game.human_can_draw() and game.current_player.should_computer_play():
+                    if game.human_player_draw() is None:
+                        break
+            game.next_player()
+
+        dealer_count, winners = game.get_winners()
+        if dealer_count > game.max_count():
+            self.dealer_busts += 1
+        winner_names = set(name for (name, score) in winners)
+        for player in game.players[:-1]:
+            counter = self.counters[player.name]
+            if player.name in winner_names:
+                counter['wins'] += 1
+            elif (not player.is_over_21() and dealer_count <= game.max_count()
+                    and player.get_hand_count() == dealer_count):
+                counter['pushes'] += 1
+            else:
+                counter['losses'] += 1
+                if player.is_over_21():
+                    counter['busts'] += 1
+        self.rounds += 1
+
+    def run(self, n_rounds):
+        """
+        Plays until n_rounds in total have been completed (including rounds
+        from a resumed checkpoint), checkpointing along the way and at the end.
+        """
+        while self.rounds < n_rounds:
+            self.play_round()
+            if self.checkpoint_path is not None and self.rounds % self.checkpoint_every == 0:
+                self.save(self.checkpoint_path)
+        if self.checkpoint_path is not None:
+            self.save(self.checkpoint_path)
+        return self.get_results()
+
+    def get_results(self):
+        """
+        Returns dict of the completed rounds, dealer busts and seat counters.
+        """
+        return {
+            'rounds': self.rounds,
+            'dealer_busts': self.dealer_busts,
+            'counters': self.counters,
+        }
+
+    def get_state(self):
+        """
+        Returns the complete simulation state as a JSON serializable dict.
+        """
+        version, internal, gauss_next = self.rng.getstate()
+        return {
+            'version': self.CHECKPOINT_VERSION,
+            'seed': self.seed,
+            'n_players': self.n_players,
+            'checkpoint_every': self.checkpoint_every,
+            'rng_state': [version, list(internal), gauss_next],
+            'seats': [player.name for player in self.game.players],
+            'cards': self.game.deck.cards,
+            **self.get_results(),
+        }
+
+    def set_state(self, state):
+        """
+        Restores state produced by get_state.
+        """
+        assert state['version'] == self.CHECKPOINT_VERSION
+        assert state['n_players'] == self.n_players
+        version, internal, gauss_next = state['rng_state']
+        self.rng.setstate((version, tuple(internal), gauss_next))
+        players = {player.name: player for player in self.game.players}
+        self.game.players = [players[name] for name in state['seats']]
+        self.game.deck.cards = list(state['cards'])
+        self.rounds = state['rounds']
+        self.dealer_busts = state['dealer_busts']
+        self.counters = state['counters']
+
+    def save(self, path):
+        """
+        Atomically writes a checkpoint: the state is written to a unique
+        temporary file in the same directory which then replaces path, so a
+        kill never leaves a partial file. The directory is synced too so the
+        rename itself survives a power failure.
+        """
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.get_state(), f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if os.name == 'posix':
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    @classmethod
+    def load(cls, path, checkpoint_every=None):
+        """
+        Creates a Simulation resumed from the checkpoint at path. Uses the
+        checkpoint's interval unless checkpoint_every is given.
+        """
+        with open(path) as f:
+            state = json.load(f)
+        if checkpoint_every is None:
+            checkpoint_every = state['checkpoint_every']
+        simulation = cls(state['n_players'], seed=state['seed'],
+                         checkpoint_path=path, checkpoint_every=checkpoint_every)
+        simulation.set_state(state)
+        return simulation
+
+def main():
+    """
+    Usage: python3 simulation.py N_ROUNDS N_PLAYERS SEED CHECKPOINT_FILE
+    Resumes from CHECKPOINT_FILE if it exists and was started with the
+    same N_PLAYERS and SEED.
+    """
+    if len(sys.argv) != 5:
+        print(main.__doc__.strip())
+        sys.exit(1)
+    n_rounds, n_players, seed, path = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), sys.argv[4]
+    if os.path.exists(path):
+        simulation = Simulation.load(path)
+        if (simulation.n_players, simulation.seed) != (n_players, seed):
+            print("Checkpoint %s was started with %s players and seed %s, not %s players and seed %s" %
+                  (path, simulation.n_players, simulation.seed, n_players, seed))
+            sys.exit(1)
+        print("Resuming from round %s" % simulation.rounds)
+    else:
+        simulation = Simulation(n_players, seed=seed, checkpoint_path=path)
+    print(json.dumps(simulation.run(n_rounds), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -5,17 +5,22 @@ Tests for the BlackJack game
 """
 
 # Test suite imports
+import os
+import tempfile
 from unittest import TestCase
+from unittest import skipUnless
 from unittest import main
 
 # BlackJack imports
 from blackjack import Game
 from deck import Deck
+from deck import EntropyPool
 from deck import Card
 from deck import Suites
 from deck import N_CARDS
 from deck import knuth_shuffle
 from player import Player
+from simulation import Simulation
 
 class TestPlayer(TestCase):
     """
@@ -164,11 +169,11 @@ class TestDeck(TestCase):
             self.assertTrue(len(visited_deck) == N_CARDS)
             self.assertTrue(deck.pop() is None)
 
-    def test_shuffle(self):
+    def check_shuffle(self, shuffle):
         """
-        Stress tests the knuth shuffling algorithm and checks that when
-        N_CARD numbers are shuffled they appear in different bins at least
-        some fraction of N_TESTS / N_CARDS number of times.
+        Stress tests a shuffle and checks that when N_CARD numbers are
+        shuffled they appear in different bins at least some fraction of
+        N_TESTS / N_CARDS number of times. shuffle() returns a new order.
         """
         N_TESTS = 10000
 
@@ -179,8 +184,7 @@ class TestDeck(TestCase):
 
         # Calculate the position of for each card 10000 times
         for _ in range(N_TESTS):
-            array = [n for n in range(N_CARDS)]
-            knuth_shuffle(array)
+            array = shuffle()
             for position in range(N_CARDS):
                 results[array[position]][position] += 1
 
@@ -201,5 +205,115 @@ class TestDeck(TestCase):
                     msg="The value " + str(results[card][position]) +
                         " was below the min statistical thresh of " + str(MIN_ACCEPTED_THRESHOLD))
 
+    def test_shuffle(self):
+        """
+        Statistically tests the knuth shuffling algorithm with `random`.
+        """
+        def shuffle():
+            array = [n for n in range(N_CARDS)]
+            knuth_shuffle(array)
+            return array
+        self.check_shuffle(shuffle)
+
+    def test_secure(self):
+        """
+        Checks that the secure deck is complete and that the entropy pool
+        returns in-range draws, including multi-byte ones, and refills.
+        """
+        deck = Deck(secure=True)
+        for _ in range(100):
+            deck.shuffle()
+            self.assertTrue(sorted(deck.cards) == list(range(N_CARDS)))
+
+        # Tiny block forces a refill on almost every draw
+        pool = EntropyPool(block_size=1)
+        for (a, b) in [(0, 0), (0, 1), (0, 51), (5, 260), (0, 2**40)]:
+            for _ in range(200):
+                draw = pool.randint(a, b)
+                self.assertTrue(a <= draw <= b)
+
+        # Every value of a small range is eventually drawn
+        seen = set(pool.randint(0, 2) for _ in range(300))
+        self.assertTrue(seen == {0, 1, 2})
+
+        # A two byte range lands in each bin within the check_shuffle thresholds
+        N_BINS = 300
+        N_DRAWS = 30000
+        pool = EntropyPool()
+        results = [0 for n in range(N_BINS)]
+        for _ in range(N_DRAWS):
+            results[pool.randint(0, N_BINS - 1)] += 1
+        IDEAL_THRESHOLD = N_DRAWS / N_BINS
+        MAX_ACCEPTED_THRESHOLD = IDEAL_THRESHOLD * 1.50
+        MIN_ACCEPTED_THRESHOLD = IDEAL_THRESHOLD * 0.50
+        for value in range(N_BINS):
+            self.assertTrue(MIN_ACCEPTED_THRESHOLD <= results[value] <= MAX_ACCEPTED_THRESHOLD,
+                msg="The value " + str(value) + " was drawn " + str(results[value]) +
+                    " times, outside the statistical thresholds")
+
+    def test_secure_shuffle(self):
+        """
+        Statistically tests a secure deck's shuffle.
+        """
+        deck = Deck(secure=True)
+        def shuffle():
+            deck.shuffle()
+            return deck.cards
+        self.check_shuffle(shuffle)
+
+    @skipUnless(hasattr(os, 'fork'), 'requires fork()')
+    def test_secure_fork(self):
+        """
+        Checks a forked child does not reuse its parent's buffered entropy.
+        """
+        pool = EntropyPool()
+        pool.read(1)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Never return into the test runner from the child
+            status = 1
+            try:
+                os.close(read_fd)
+                os.write(write_fd, pool.read(64))
+                status = 0
+            finally:
+                os._exit(status)
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as f:
+            child_bytes = f.read()
+        _, status = os.waitpid(pid, 0)
+        self.assertTrue(status == 0)
+        self.assertTrue(len(child_bytes) == 64)
+        self.assertTrue(child_bytes != pool.read(64))
+
+class TestSimulation(TestCase):
+    """
+    Checks that a simulation resumed from a checkpoint finishes with exactly
+    the same results as one that ran without interruption.
+    """
+
+    def test_resume(self):
+        """ Kills a run between checkpoints and expects the resumed run to match an unbroken one """
+        N_ROUNDS = 500
+        expected = Simulation(3, seed=226).run(N_ROUNDS)
+        self.assertTrue(expected['rounds'] == N_ROUNDS)
+        for counter in expected['counters'].values():
+            self.assertTrue(counter['wins'] + counter['losses'] + counter['pushes'] == N_ROUNDS)
+            self.assertTrue(counter['busts'] <= counter['losses'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoint.json')
+            # Stop between checkpoints as if the process was killed
+            killed = Simulation(3, seed=226, checkpoint_path=path, checkpoint_every=50)
+            killed.run(150)
+            for _ in range(25):
+                killed.play_round()
+            resumed = Simulation.load(path)
+            self.assertTrue(resumed.rounds == 150)
+            self.assertTrue(resumed.checkpoint_every == 50)
+            self.assertTrue(resumed.run(N_ROUNDS) == expected)
+            self.assertTrue(os.listdir(directory) == ['checkpoint.json'])
+
 if __name__ == '__main__':
     main()